@@ -1,48 +1,158 @@
-import pandas as pd
-from jinja2 import Environment, FileSystemLoader, TemplateNotFound
-from collections import defaultdict
-import argparse
+import functools
+import glob
+import hashlib
+import importlib.util
 import os
+import sys
+import tempfile
 from pathlib import Path
-from dotenv import load_dotenv
 from datetime import datetime
+from types import SimpleNamespace
+
+EXCEL_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') else 'openpyxl'
+
+REPORT_TEMPLATE_FILEPATH = 'report.txt.j2'
+TEMPLATE_CACHE_DIRPATH = '.jinja_cache'
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+WINE_FIELDS = {
+    'Название': 'name',
+    'Сорт': 'grape_type',
+    'Цена': 'price',
+    'Картинка': 'image',
+    'Акция': 'promotion'
+}
+
+CATALOG_COLUMNS = ['Категория', *WINE_FIELDS]
+CATALOG_DTYPES = {
+    'Категория': 'category',
+    'Название': 'string',
+    'Сорт': 'string',
+    'Картинка': 'string',
+    'Акция': 'string'
+}
+CATALOG_CACHE_SCHEMA = hashlib.blake2b(
+    repr((CATALOG_COLUMNS, CATALOG_DTYPES)).encode(), digest_size=4
+).hexdigest()
+
+
+@functools.cache
+def load_defaults():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return SimpleNamespace(
+        excel_file=os.getenv('WINE_EXCEL_FILE', 'wine_price_list.xlsx'),
+        template=os.getenv('WINE_TEMPLATE_FILE', 'template.html'),
+        output=os.getenv('WINE_OUTPUT_FILE', 'index.html'),
+        foundation_year=int(os.getenv('WINE_FOUNDATION_YEAR', '1920'))
+    )
+
+
+def create_parser(defaults):
+    import argparse
 
-load_dotenv()
-
-FOUNDATION_YEAR = int(os.getenv('WINE_FOUNDATION_YEAR', '1920'))
-DEFAULT_EXCEL_FILEPATH = os.getenv('WINE_EXCEL_FILE', 'wine_price_list.xlsx')
-DEFAULT_TEMPLATE_FILEPATH = os.getenv('WINE_TEMPLATE_FILE', 'template.html')
-DEFAULT_OUTPUT_FILEPATH = os.getenv('WINE_OUTPUT_FILE', 'index.html')
-
-
-def create_parser():
     parser = argparse.ArgumentParser(description='Генератор сайта винного магазина')
-    parser.add_argument('--excel-file', default=DEFAULT_EXCEL_FILEPATH,
-                       help=f'Путь к Excel файлу (по умолчанию: {DEFAULT_EXCEL_FILEPATH})')
-    parser.add_argument('--template', default=DEFAULT_TEMPLATE_FILEPATH,
-                       help=f'Путь к HTML шаблону (по умолчанию: {DEFAULT_TEMPLATE_FILEPATH})')
-    parser.add_argument('--output', default=DEFAULT_OUTPUT_FILEPATH,
-                       help=f'Путь для сохранения HTML (по умолчанию: {DEFAULT_OUTPUT_FILEPATH})')
-    parser.add_argument('--foundation-year', type=int, default=FOUNDATION_YEAR,
-                       help=f'Год основания винодельни (по умолчанию: {FOUNDATION_YEAR})')
+    parser.add_argument('--excel-file', default=defaults.excel_file,
+                       help=f'Путь к Excel файлу (по умолчанию: {defaults.excel_file})')
+    parser.add_argument('--template', default=defaults.template,
+                       help=f'Путь к HTML шаблону (по умолчанию: {defaults.template})')
+    parser.add_argument('--output', default=defaults.output,
+                       help=f'Путь для сохранения HTML (по умолчанию: {defaults.output})')
+    parser.add_argument('--foundation-year', type=int, default=defaults.foundation_year,
+                       help=f'Год основания винодельни (по умолчанию: {defaults.foundation_year})')
     return parser
 
 
+def parse_args():
+    defaults = load_defaults()
+    if len(sys.argv) == 1:
+        return defaults
+    return create_parser(defaults).parse_args()
+
+
 def calculate_winery_age(foundation_year, current_year):
     return current_year - foundation_year
 
 
-def get_year_word(years):
+def compute_year_word(years):
     if 11 <= years % 100 <= 14:
         return "лет"
     last_digit = years % 10
     return "год" if last_digit == 1 else "года" if 2 <= last_digit <= 4 else "лет"
 
 
+YEAR_WORDS = tuple(compute_year_word(years) for years in range(100))
+
+
+def get_year_word(years):
+    return YEAR_WORDS[years % 100]
+
+
 def read_excel_file(file_path):
     if not Path(file_path).is_file():
         raise FileNotFoundError(f"Файл не найден: {file_path}")
-    return pd.read_excel(file_path, na_values=['', ' ', 'N/A', 'NULL'], keep_default_na=False)
+    import pandas as pd
+
+    return pd.read_excel(file_path, engine=EXCEL_ENGINE,
+                         usecols=lambda column: column in CATALOG_COLUMNS, dtype=CATALOG_DTYPES,
+                         na_values=['', ' ', 'N/A', 'NULL'], keep_default_na=False)
+
+
+def get_catalog_cache_filepath(file_path):
+    stat = os.stat(file_path)
+    return f'{file_path}.{CATALOG_CACHE_SCHEMA}-{stat.st_mtime_ns}-{stat.st_size}.parquet'
+
+
+def read_catalog_cache(parquet_filepath):
+    try:
+        import pandas as pd
+
+        return pd.read_parquet(parquet_filepath)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"⚠️  Кэш каталога не прочитан, используется Excel: {e}")
+        return None
+
+
+def save_catalog_cache(catalog, parquet_filepath):
+    cache = Path(parquet_filepath)
+    temp_filepath = None
+    try:
+        descriptor, temp_filepath = tempfile.mkstemp(prefix=f'{cache.name}.', suffix='.tmp',
+                                                     dir=cache.parent)
+        os.close(descriptor)
+        catalog.to_parquet(temp_filepath, compression='zstd')
+        os.replace(temp_filepath, parquet_filepath)
+        temp_filepath = None
+    except (ImportError, OSError, TypeError, ValueError) as e:
+        print(f"⚠️  Кэш каталога не сохранен: {e}")
+    finally:
+        if temp_filepath is not None:
+            Path(temp_filepath).unlink(missing_ok=True)
+
+
+def remove_stale_catalog_caches(file_path, parquet_filepath):
+    source = Path(file_path)
+    for cache in source.parent.glob(f'{glob.escape(source.name)}.*.parquet'):
+        if cache.name != Path(parquet_filepath).name:
+            try:
+                cache.unlink()
+            except OSError:
+                pass
+
+
+def read_cached_excel_file(file_path):
+    if not Path(file_path).is_file():
+        return read_excel_file(file_path)
+    parquet_filepath = get_catalog_cache_filepath(file_path)
+    if Path(parquet_filepath).is_file():
+        catalog = read_catalog_cache(parquet_filepath)
+        if catalog is not None:
+            return catalog
+    catalog = read_excel_file(file_path)
+    save_catalog_cache(catalog, parquet_filepath)
+    remove_stale_catalog_caches(file_path, parquet_filepath)
+    return catalog
 
 
 def validate_catalog_columns(catalog):
@@ -52,67 +162,114 @@ def validate_catalog_columns(catalog):
         raise KeyError(f"Отсутствуют обязательные колонки: {', '.join(missing)}")
 
 
-def extract_wine(row):
-    return {
-        'name': row['Название'],
-        'grape_type': row.get('Сорт', ''),
-        'price': row['Цена'],
-        'image': row['Картинка'],
-        'promotion': row.get('Акция', '')
-    }
+def load_catalog(excel_filepath):
+    catalog = read_cached_excel_file(excel_filepath)
+    validate_catalog_columns(catalog)
+    catalog = catalog.reindex(columns=CATALOG_COLUMNS)
+    catalog[['Сорт', 'Акция']] = catalog[['Сорт', 'Акция']].fillna('')
+    return catalog
 
 
 def group_by_category(catalog):
-    grouped = defaultdict(list)
-    for _, row in catalog.iterrows():
-        wine = extract_wine(row)
-        grouped[row['Категория']].append(wine)
-    return grouped
+    catalog = catalog.sort_values('Категория', kind='stable', ignore_index=True)
+    catalog = catalog.rename(columns=WINE_FIELDS)
+    columns = {field: catalog[field].tolist() for field in WINE_FIELDS.values()}
+    sizes = catalog.groupby('Категория', sort=False, observed=True).size()
 
+    grouped = {}
+    start = 0
+    for category, size in sizes.items():
+        stop = start + size
+        grouped[category] = {field: values[start:stop] for field, values in columns.items()}
+        start = stop
+    return grouped, start
 
-def create_template_environment():
-    return Environment(loader=FileSystemLoader('.'))
 
+def create_template_environment():
+    from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 
-def render_template(env, template_filepath, context):
-    return env.get_template(template_filepath).render(**context)
+    os.makedirs(TEMPLATE_CACHE_DIRPATH, exist_ok=True)
+    return Environment(
+        loader=FileSystemLoader('.'),
+        bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE_DIRPATH),
+        auto_reload=False,
+        cache_size=-1
+    )
 
 
-def save_html(content, output_filepath):
-    with open(output_filepath, 'w', encoding='utf-8') as file:
-        file.write(content)
+def get_output_file_mode(output_filepath):
+    try:
+        return os.stat(output_filepath).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
 
 
-def render_catalog_page(catalog, years, year_word, template_filepath, output_filepath):
-    env = create_template_environment()
+def render_catalog_page(env, catalog, years, year_word, template_filepath, output_filepath):
     context = {'winery_years': years, 'year_word': year_word, 'wines': catalog}
-    html = render_template(env, template_filepath, context)
-    save_html(html, output_filepath)
+    stream = env.get_template(template_filepath).stream(**context)
+    stream.enable_buffering(size=64)
+    output = Path(output_filepath)
+    descriptor, temp_filepath = tempfile.mkstemp(prefix=f'.{output.name}.', suffix='.tmp',
+                                                 dir=output.parent)
+    try:
+        with open(descriptor, 'wb', buffering=OUTPUT_BUFFER_SIZE) as file:
+            stream.dump(file, encoding='utf-8')
+        os.chmod(temp_filepath, get_output_file_mode(output_filepath))
+        os.replace(temp_filepath, output_filepath)
+        temp_filepath = None
+    finally:
+        if temp_filepath is not None:
+            Path(temp_filepath).unlink(missing_ok=True)
+
+
+def get_cache_key(config):
+    digest = hashlib.blake2b()
+    for filepath in (config['excel_filepath'], config['template_filepath']):
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        digest.update(f"{filepath}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+    digest.update(f"{config['foundation_year']}:{config['current_year']}".encode())
+    return digest.hexdigest()
+
 
+def get_cache_key_filepath(output_filepath):
+    output = Path(output_filepath)
+    return output.with_name(f'.{output.name}.cachekey')
 
-def count_wines(catalog):
-    return sum(len(wines) for wines in catalog.values())
 
+def is_page_up_to_date(cache_key, output_filepath):
+    cache_key_filepath = get_cache_key_filepath(output_filepath)
+    if cache_key is None or not Path(output_filepath).is_file() or not cache_key_filepath.is_file():
+        return False
+    return cache_key_filepath.read_text(encoding='utf-8') == cache_key
 
-def print_category_stats(catalog):
-    for category, wines in catalog.items():
-        print(f"     - {category}: {len(wines)}")
 
+def remove_cache_key(output_filepath):
+    get_cache_key_filepath(output_filepath).unlink(missing_ok=True)
 
-def show_report(catalog, years, year_word, config):
-    print(f"\n📊 Отчет:")
-    print(f"   • Винодельне: {years} {year_word}")
-    print(f"   • Файл: {config['excel_filepath']}")
-    print(f"   • Шаблон: {config['template_filepath']}")
-    print(f"   • Результат: {config['output_filepath']}")
-    print("   • Вина по категориям:")
-    print_category_stats(catalog)
-    print(f"   • Всего: {count_wines(catalog)}")
+
+def save_cache_key(cache_key, output_filepath):
+    if cache_key is not None:
+        get_cache_key_filepath(output_filepath).write_text(cache_key, encoding='utf-8')
+
+
+def show_report(env, catalog, wines_count, years, year_word, config):
+    context = {
+        'winery_years': years,
+        'year_word': year_word,
+        'config': config,
+        'catalog': catalog,
+        'wines_count': wines_count
+    }
+    sys.stdout.write(env.get_template(REPORT_TEMPLATE_FILEPATH).render(**context))
 
 
 def main():
-    parser = create_parser()
-    args = parser.parse_args()
+    args = parse_args()
 
     current_year = datetime.now().year
 
@@ -134,11 +291,17 @@ def main():
     years = calculate_winery_age(config['foundation_year'], config['current_year'])
     year_word = get_year_word(years)
 
-   
+    cache_key = get_cache_key(config)
+    if is_page_up_to_date(cache_key, config['output_filepath']):
+        print("✅ Исходные данные не изменились, HTML-страница актуальна")
+        return
+
+    import pandas as pd
+    from jinja2 import TemplateNotFound
+
     try:
-        catalog_df = read_excel_file(config['excel_filepath'])
-        validate_catalog_columns(catalog_df)
-        catalog = group_by_category(catalog_df)
+        catalog_df = load_catalog(config['excel_filepath'])
+        catalog, wines_count = group_by_category(catalog_df)
         print("✅ Каталог вин загружен и сгруппирован")
     except FileNotFoundError as e:
         print(f"❌ Файл не найден: {e}")
@@ -154,13 +317,17 @@ def main():
         return
 
     try:
+        remove_cache_key(config['output_filepath'])
+        env = create_template_environment()
         render_catalog_page(
+            env,
             catalog,
             years,
             year_word,
             config['template_filepath'],
             config['output_filepath']
         )
+        save_cache_key(cache_key, config['output_filepath'])
         print("✅ HTML-страница успешно сгенерирована")
     except TemplateNotFound as e:
         print(f"❌ Шаблон не найден: {e}")
@@ -169,7 +336,10 @@ def main():
         print(f"❌ Ошибка ввода-вывода при записи результата: {e}")
         return
 
-    show_report(catalog, years, year_word, config)
+    try:
+        show_report(env, catalog, wines_count, years, year_word, config)
+    except TemplateNotFound as e:
+        print(f"❌ Шаблон отчета не найден: {e}")
 
 
 if __name__ == "__main__":